@@ -140,6 +140,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Статический снимок каталога маршрутов, который отдаёт nginx фронтенда
+ROUTES_SNAPSHOT_ROOT = os.environ.get('ROUTES_SNAPSHOT_ROOT', os.path.join(BASE_DIR, 'snapshot'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Route
+from .models import Route, RouteStats
+from .snapshot import schedule_routes_snapshot
 
 
 @admin.register(Route)
@@ -8,4 +9,34 @@ class RouteAdmin(admin.ModelAdmin):
 
     list_filter = ('date', 'walkType')
 
-    search_fields = ('name',)
\ No newline at end of file
+    search_fields = ('name',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        schedule_routes_snapshot()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        schedule_routes_snapshot()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        schedule_routes_snapshot()
+
+
+@admin.register(RouteStats)
+class RouteStatsAdmin(admin.ModelAdmin):
+    list_display = ('year', 'walkType', 'routeCount', 'totalKm', 'longestKm')
+
+    list_filter = ('year', 'walkType')
+
+    readonly_fields = ('year', 'walkType', 'routeCount', 'totalKm', 'longestKm', 'longestRoute')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,128 @@
+"""
+Сетка для поиска маршрутов рядом с точкой.
+Ячейки задаются в градусах; трек раскладывается по ячейкам посегментно,
+а точное расстояние считается векторно в локальной проекции вокруг точки запроса.
+"""
+from math import cos, floor, isfinite, radians
+
+import numpy as np
+
+# Размер ячейки в градусах: ~550 м по широте, ~300 м по долготе на широте Москвы
+CELL_SIZE_DEG = 0.005
+
+# Сегменты длиннее ~55 км считаются разрывом записи или сбоем GPS (например, точка 0,0):
+# в индекс попадают только их концы, иначе один такой сегмент даёт десятки тысяч ячеек
+MAX_SEGMENT_DEG = 0.5
+
+EARTH_RADIUS = 6371000
+METERS_PER_DEG_LAT = 111320
+
+
+def cell_of(lat, lng):
+    return floor(lng / CELL_SIZE_DEG), floor(lat / CELL_SIZE_DEG)
+
+
+def track_coords(points):
+    """
+    Список точек трека в массив [[lat, lng], ...].
+    points может быть любым JSON: не-список даёт пустой трек, а точки
+    с нечисловыми, бесконечными или вне диапазона координатами отбрасываются.
+    """
+    coords = []
+    if not isinstance(points, list):
+        points = []
+    for p in points:
+        try:
+            lat, lng = float(p['lat']), float(p.get('lng', p.get('lon')))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            continue
+        if isfinite(lat) and isfinite(lng) and -90 <= lat <= 90 and -180 <= lng <= 180:
+            coords.append((lat, lng))
+    return np.array(coords, dtype=float).reshape(-1, 2)
+
+
+def _gap_mask(coords):
+    """Для каждого сегмента: True, если он считается разрывом трека."""
+    return np.abs(np.diff(coords, axis=0)).max(axis=1) > MAX_SEGMENT_DEG
+
+
+def _densify(coords):
+    """
+    Дробит сегменты так, чтобы шаг между точками был не больше половины ячейки.
+    Возвращает точки и маску «соседние точки соединены»; разрывы не дробятся.
+    """
+    gaps = _gap_mask(coords)
+    deltas = np.diff(coords, axis=0)
+    steps = np.maximum(np.ceil(np.abs(deltas).max(axis=1) / (CELL_SIZE_DEG / 2)), 1).astype(int)
+    steps[gaps] = 1
+    if (steps == 1).all():
+        return coords, ~gaps
+
+    parts, connected = [coords[:1]], []
+    for start, delta, n, gap in zip(coords[:-1], deltas, steps, gaps):
+        parts.append(start + np.arange(1, n + 1)[:, None] / n * delta)
+        connected.append(np.full(n, not gap))
+    return np.vstack(parts), np.concatenate(connected)
+
+
+def track_cells(points):
+    """
+    Множество ячеек (x, y), которые задевает трек.
+    Сегменты дробятся до шага меньше ячейки, и для каждого куска берутся
+    все ячейки его ограничивающего прямоугольника (их не больше четырёх),
+    поэтому длинные сегменты между редкими точками тоже попадают в индекс.
+    """
+    coords = track_coords(points)
+    if not len(coords):
+        return set()
+
+    coords, connected = _densify(coords)
+    cells = np.floor(coords / CELL_SIZE_DEG).astype(np.int64)
+    ys, xs = cells[:, 0], cells[:, 1]
+    if len(cells) > 1:
+        x0, x1 = xs[:-1][connected], xs[1:][connected]
+        y0, y1 = ys[:-1][connected], ys[1:][connected]
+        xs = np.concatenate([xs, x0, x1])
+        ys = np.concatenate([ys, y1, y0])
+
+    unique = np.unique(np.stack([xs, ys], axis=1), axis=0)
+    return {(int(x), int(y)) for x, y in unique}
+
+
+def cell_range(lat, lng, radius):
+    """Диапазоны столбцов и строк сетки, покрывающие круг радиуса radius (м)."""
+    d_lat = radius / METERS_PER_DEG_LAT
+    d_lng = radius / (METERS_PER_DEG_LAT * max(cos(radians(lat)), 0.01))
+    x0, y0 = cell_of(lat - d_lat, lng - d_lng)
+    x1, y1 = cell_of(lat + d_lat, lng + d_lng)
+    return (x0, x1), (y0, y1)
+
+
+def distance_to_track(lat, lng, points):
+    """
+    Минимальное расстояние (м) от точки до ломаной трека.
+    Все сегменты обрабатываются одним векторным проходом в равнопромежуточной
+    проекции с центром в точке запроса, чего достаточно на расстояниях в несколько км.
+    """
+    coords = track_coords(points)
+    if not len(coords):
+        return None
+
+    k = radians(1) * EARTH_RADIUS
+    ys = (coords[:, 0] - lat) * k
+    xs = (coords[:, 1] - lng) * k * cos(radians(lat))
+
+    if len(coords) == 1:
+        return float(np.hypot(xs[0], ys[0]))
+
+    ax, ay, bx, by = xs[:-1], ys[:-1], xs[1:], ys[1:]
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(length_sq > 0, -(ax * dx + ay * dy) / length_sq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    distances = np.hypot(ax + t * dx, ay + t * dy)
+    # Разрывы не считаются частью трека, остаются только их концы
+    gaps = _gap_mask(coords)
+    distances[gaps] = np.minimum(np.hypot(ax, ay), np.hypot(bx, by))[gaps]
+    return float(distances.min())
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from routes.snapshot import export_routes_snapshot
+
+
+class Command(BaseCommand):
+    help = "Выгружает каталог маршрутов в статические файлы для раздачи через nginx"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help="Каталог для снимка (по умолчанию ROUTES_SNAPSHOT_ROOT)")
+
+    def handle(self, *args, **options):
+        try:
+            manifest = export_routes_snapshot(options['root'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Снимок {manifest['version']} выгружен: {manifest['routeCount']} маршрутов"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from routes.services import rebuild_route_grid
+
+
+class Command(BaseCommand):
+    help = "Полностью пересобирает сеточный индекс треков для поиска маршрутов рядом"
+
+    def handle(self, *args, **options):
+        count = rebuild_route_grid()
+        self.stdout.write(self.style.SUCCESS(f"Сетка пересобрана: {count} ячеек"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from routes.services import rebuild_route_stats
+
+
+class Command(BaseCommand):
+    help = "Полностью пересобирает сводную статистику маршрутов по годам и типам прогулки"
+
+    def handle(self, *args, **options):
+        count = rebuild_route_stats()
+        self.stdout.write(self.style.SUCCESS(f"Статистика пересобрана: {count} строк"))
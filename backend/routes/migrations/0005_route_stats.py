@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractYear
+
+
+def fill_route_stats(apps, schema_editor):
+    Route = apps.get_model('routes', 'Route')
+    RouteStats = apps.get_model('routes', 'RouteStats')
+
+    buckets = (
+        Route.objects
+        .annotate(year=ExtractYear('date'))
+        .values('year', 'walkType')
+        .order_by()
+        .annotate(routeCount=Count('id'), totalKm=Sum('distanceKm'))
+    )
+    for bucket in buckets:
+        longest = (
+            Route.objects
+            .filter(date__year=bucket['year'], walkType=bucket['walkType'])
+            .order_by('-distanceKm', '-id')
+            .values('id', 'distanceKm')
+            .first()
+        )
+        RouteStats.objects.create(
+            year=bucket['year'],
+            walkType=bucket['walkType'],
+            routeCount=bucket['routeCount'],
+            totalKm=round(bucket['totalKm'] or 0, 1),
+            longestKm=longest['distanceKm'],
+            longestRoute_id=longest['id'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0004_alter_route_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField(verbose_name='Год')),
+                ('walkType', models.CharField(choices=[('walk', 'Пешая'), ('bike', 'Велосипедная')], max_length=10, verbose_name='Тип прогулки')),
+                ('routeCount', models.PositiveIntegerField(default=0, verbose_name='Количество маршрутов')),
+                ('totalKm', models.FloatField(default=0.0, verbose_name='Суммарная дистанция (км)')),
+                ('longestKm', models.FloatField(default=0.0, verbose_name='Самый длинный маршрут (км)')),
+                ('longestRoute', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='routes.route', verbose_name='Самый длинный маршрут')),
+            ],
+            options={
+                'verbose_name': 'Статистика маршрутов',
+                'verbose_name_plural': 'Статистика маршрутов',
+                'ordering': ['-year', 'walkType'],
+                'constraints': [models.UniqueConstraint(fields=('year', 'walkType'), name='unique_route_stats_year_walk_type')],
+            },
+        ),
+        migrations.RunPython(fill_route_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:15
+
+import django.db.models.deletion
+from math import ceil, floor, isfinite
+
+from django.db import migrations, models
+
+# Копия логики routes.grid на момент миграции, чтобы её результат не менялся вместе с кодом
+CELL_SIZE_DEG = 0.005
+MAX_SEGMENT_DEG = 0.5
+
+
+def track_cells(points):
+    coords = []
+    for p in points if isinstance(points, list) else []:
+        try:
+            lat, lng = float(p['lat']), float(p.get('lng', p.get('lon')))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            continue
+        if isfinite(lat) and isfinite(lng) and -90 <= lat <= 90 and -180 <= lng <= 180:
+            coords.append((lat, lng))
+
+    dense, connected = coords[:1], []
+    for (lat0, lng0), (lat1, lng1) in zip(coords, coords[1:]):
+        span = max(abs(lat1 - lat0), abs(lng1 - lng0))
+        if span > MAX_SEGMENT_DEG:
+            dense.append((lat1, lng1))
+            connected.append(False)
+            continue
+        n = max(ceil(span / (CELL_SIZE_DEG / 2)), 1)
+        dense += [(lat0 + (lat1 - lat0) * i / n, lng0 + (lng1 - lng0) * i / n) for i in range(1, n + 1)]
+        connected += [True] * n
+
+    cells = [(floor(lng / CELL_SIZE_DEG), floor(lat / CELL_SIZE_DEG)) for lat, lng in dense]
+    result = set(cells)
+    for (x0, y0), (x1, y1), joined in zip(cells, cells[1:], connected):
+        if joined:
+            result.update({(x0, y1), (x1, y0)})
+    return result
+
+
+def fill_route_cells(apps, schema_editor):
+    Route = apps.get_model('routes', 'Route')
+    RouteCell = apps.get_model('routes', 'RouteCell')
+
+    for route in Route.objects.only('id', 'points').iterator(chunk_size=50):
+        RouteCell.objects.bulk_create([
+            RouteCell(route_id=route.id, cellX=x, cellY=y) for x, y in track_cells(route.points)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0005_route_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cellX', models.IntegerField(verbose_name='Столбец сетки')),
+                ('cellY', models.IntegerField(verbose_name='Строка сетки')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='routes.route', verbose_name='Маршрут')),
+            ],
+            options={
+                'verbose_name': 'Ячейка сетки маршрута',
+                'verbose_name_plural': 'Ячейки сетки маршрутов',
+                'indexes': [models.Index(fields=['cellY', 'cellX'], name='route_cell_yx_idx')],
+                'constraints': [models.UniqueConstraint(fields=('route', 'cellY', 'cellX'), name='unique_route_cell')],
+            },
+        ),
+        migrations.RunPython(fill_route_cells, migrations.RunPython.noop),
+    ]
@@ -58,4 +58,81 @@ class Route(models.Model):
     class Meta:
         ordering = ['-date', '-id']
         verbose_name = "Маршрут"
-        verbose_name_plural = "Маршруты"
\ No newline at end of file
+        verbose_name_plural = "Маршруты"
+
+
+class RouteStats(models.Model):
+    """
+    Сводка по маршрутам в разрезе года и типа прогулки.
+    Поддерживается сигналами Route (см. signals.py), полностью
+    пересобирается командой rebuild_route_stats.
+    """
+    year = models.PositiveIntegerField(verbose_name="Год")
+
+    walkType = models.CharField(
+        max_length=10,
+        choices=Route.WALK_TYPES,
+        verbose_name="Тип прогулки"
+    )
+
+    routeCount = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Количество маршрутов"
+    )
+
+    totalKm = models.FloatField(
+        default=0.0,
+        verbose_name="Суммарная дистанция (км)"
+    )
+
+    longestKm = models.FloatField(
+        default=0.0,
+        verbose_name="Самый длинный маршрут (км)"
+    )
+
+    longestRoute = models.ForeignKey(
+        Route,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name="Самый длинный маршрут"
+    )
+
+    def __str__(self):
+        return f"{self.year} - {self.walkType}: {self.routeCount} ({self.totalKm} км)"
+
+    class Meta:
+        ordering = ['-year', 'walkType']
+        verbose_name = "Статистика маршрутов"
+        verbose_name_plural = "Статистика маршрутов"
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'walkType'], name='unique_route_stats_year_walk_type'),
+        ]
+
+
+class RouteCell(models.Model):
+    """
+    Ячейка географической сетки, через которую проходит трек маршрута.
+    Строится по сегментам трека при сохранении (см. grid.py).
+    """
+    route = models.ForeignKey(
+        Route,
+        on_delete=models.CASCADE,
+        related_name='cells',
+        verbose_name="Маршрут"
+    )
+
+    cellX = models.IntegerField(verbose_name="Столбец сетки")
+
+    cellY = models.IntegerField(verbose_name="Строка сетки")
+
+    class Meta:
+        verbose_name = "Ячейка сетки маршрута"
+        verbose_name_plural = "Ячейки сетки маршрутов"
+        indexes = [
+            models.Index(fields=['cellY', 'cellX'], name='route_cell_yx_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['route', 'cellY', 'cellX'], name='unique_route_cell'),
+        ]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Route
+from .models import Route, RouteStats
 import logging
 
 logger = logging.getLogger(__name__)
@@ -74,4 +74,24 @@ class RouteSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Route
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class RouteStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RouteStats
+        fields = ['year', 'walkType', 'routeCount', 'totalKm', 'longestKm', 'longestRoute']
+
+
+class RouteBriefSerializer(serializers.ModelSerializer):
+    """Краткое представление маршрута без трека."""
+    class Meta:
+        model = Route
+        fields = ['id', 'name', 'date', 'distanceKm', 'walkType']
+
+
+class RouteIndexSerializer(RouteSerializer):
+    """Маршрут без трека для индекса статического снимка."""
+    class Meta(RouteSerializer.Meta):
+        fields = None
+        exclude = ['points']
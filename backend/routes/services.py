@@ -1,9 +1,13 @@
 import gpxpy
 import re
 
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractYear
 from django.utils import timezone
 
-from .models import Route
+from .grid import track_cells, cell_range, distance_to_track
+from .models import Route, RouteStats, RouteCell
 from math import radians, cos, sin, asin, sqrt
 
 
@@ -104,4 +108,173 @@ def get_smart_location_name(coord, default_name="Точка"):
                 except (TypeError, ValueError, AttributeError):
                     continue
 
-    return default_name
\ No newline at end of file
+    return default_name
+
+
+def get_stats_bucket(date, walk_type):
+    """
+    Ключ сводки (год, тип прогулки) для маршрута.
+    date может прийти строкой, если объект создан из данных импорта.
+    """
+    date = Route._meta.get_field('date').to_python(date)
+    if date is None:
+        return None
+    return date.year, walk_type
+
+
+def _lock_route_stats(year, walk_type):
+    """
+    Блокирует строку сводки до конца транзакции, при необходимости создав её.
+    Параллельная вставка той же строки дождётся нашей и получит IntegrityError.
+    """
+    try:
+        with transaction.atomic():
+            RouteStats.objects.get_or_create(year=year, walkType=walk_type)
+    except IntegrityError:
+        pass
+    return RouteStats.objects.select_for_update().get(year=year, walkType=walk_type)
+
+
+def refresh_route_stats(year, walk_type):
+    """
+    Пересчитывает одну строку RouteStats агрегатным запросом.
+    Треки (points) при этом не загружаются.
+    Агрегаты считаются только после блокировки строки: второй писатель
+    ждёт первого и видит уже зафиксированные им маршруты.
+    """
+    with transaction.atomic():
+        stats = _lock_route_stats(year, walk_type)
+
+        routes = Route.objects.filter(date__year=year, walkType=walk_type)
+        totals = routes.aggregate(routeCount=Count('id'), totalKm=Sum('distanceKm'))
+
+        if not totals['routeCount']:
+            stats.delete()
+            return None
+
+        longest = routes.order_by('-distanceKm', '-id').values('id', 'distanceKm').first()
+
+        stats.routeCount = totals['routeCount']
+        stats.totalKm = round(totals['totalKm'] or 0, 1)
+        stats.longestKm = longest['distanceKm']
+        stats.longestRoute_id = longest['id']
+        stats.save()
+    return stats
+
+
+def rebuild_route_stats():
+    """
+    Полностью пересобирает таблицу RouteStats.
+    """
+    buckets = (
+        Route.objects
+        .annotate(year=ExtractYear('date'))
+        .values_list('year', 'walkType')
+        .order_by()
+        .distinct()
+    )
+
+    with transaction.atomic():
+        RouteStats.objects.all().delete()
+        for year, walk_type in buckets:
+            refresh_route_stats(year, walk_type)
+
+    return RouteStats.objects.count()
+
+
+def refresh_route_stats_for(buckets):
+    """
+    Пересчитывает сводку для набора ключей (год, тип).
+    Нужна после bulk_create/bulk_update, которые не отправляют сигналы.
+    """
+    # Фиксированный порядок блокировок, чтобы параллельные пакеты не взаимоблокировались
+    for bucket in sorted({bucket for bucket in buckets if bucket}):
+        refresh_route_stats(*bucket)
+
+
+def apply_route_batch(to_create, to_update, to_delete):
+    """
+    Применяет пакет изменений маршрутов в одной транзакции.
+    to_create: список validated_data новых маршрутов
+    to_update: список пар (объект Route, validated_data) для частичного обновления
+    to_delete: список id маршрутов на удаление
+    """
+    buckets = []
+
+    with transaction.atomic():
+        created = Route.objects.bulk_create([Route(**data) for data in to_create])
+        buckets += [get_stats_bucket(route.date, route.walkType) for route in created]
+        for route in created:
+            index_route_track(route)
+
+        # bulk_update принимает один список полей, поэтому группируем по набору изменённых полей
+        groups = {}
+        for route, data in to_update:
+            buckets.append(get_stats_bucket(route.date, route.walkType))
+            for field, value in data.items():
+                setattr(route, field, value)
+            buckets.append(get_stats_bucket(route.date, route.walkType))
+            groups.setdefault(tuple(sorted(data)), []).append(route)
+
+        for fields, routes in groups.items():
+            if fields:
+                Route.objects.bulk_update(routes, fields)
+            if 'points' in fields:
+                for route in routes:
+                    index_route_track(route)
+
+        # Удаление идёт через QuerySet.delete, сигналы post_delete сами обновят сводку
+        Route.objects.filter(pk__in=to_delete).only('id', 'date', 'walkType').delete()
+
+        refresh_route_stats_for(buckets)
+
+    return created, [route for route, _ in to_update], to_delete
+
+
+def index_route_track(route):
+    """
+    Перестраивает ячейки сетки для трека маршрута.
+    """
+    cells = track_cells(route.points)
+    with transaction.atomic():
+        RouteCell.objects.filter(route=route).delete()
+        RouteCell.objects.bulk_create([RouteCell(route=route, cellX=x, cellY=y) for x, y in cells])
+    return len(cells)
+
+
+def rebuild_route_grid():
+    """
+    Полностью пересобирает сеточный индекс треков.
+    """
+    count = 0
+    with transaction.atomic():
+        RouteCell.objects.all().delete()
+        for route in Route.objects.only('id', 'points').iterator(chunk_size=50):
+            cells = [RouteCell(route=route, cellX=x, cellY=y) for x, y in track_cells(route.points)]
+            RouteCell.objects.bulk_create(cells, batch_size=1000)
+            count += len(cells)
+    return count
+
+
+def find_routes_near(lat, lng, radius):
+    """
+    Маршруты, трек которых проходит не дальше radius метров от точки.
+    Кандидаты берутся из соседних ячеек сетки, треки загружаются только для них.
+    Возвращает список пар (маршрут, расстояние в метрах), ближайшие первыми.
+    """
+    (x0, x1), (y0, y1) = cell_range(lat, lng, radius)
+    candidate_ids = (
+        RouteCell.objects
+        .filter(cellY__range=(y0, y1), cellX__range=(x0, x1))
+        .values_list('route_id', flat=True)
+        .distinct()
+    )
+
+    result = []
+    for route in Route.objects.filter(id__in=candidate_ids):
+        distance = distance_to_track(lat, lng, route.points)
+        if distance is not None and distance <= radius:
+            result.append((route, distance))
+
+    result.sort(key=lambda item: item[1])
+    return result
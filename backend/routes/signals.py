@@ -0,0 +1,51 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Route
+from .services import get_stats_bucket, refresh_route_stats, index_route_track
+
+# Поля маршрута, от которых зависит сводка RouteStats
+STATS_FIELDS = {'date', 'walkType', 'distanceKm'}
+
+
+def _affects_stats(update_fields):
+    return update_fields is None or bool(STATS_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=Route)
+def remember_stats_bucket(sender, instance, update_fields=None, **kwargs):
+    """Запоминаем старые год и тип, чтобы пересчитать их, если маршрут переместился."""
+    instance._stats_bucket_before = None
+    if instance.pk is None or not _affects_stats(update_fields):
+        return
+
+    old = Route.objects.filter(pk=instance.pk).values_list('date', 'walkType').first()
+    if old:
+        instance._stats_bucket_before = get_stats_bucket(*old)
+
+
+@receiver(post_save, sender=Route)
+def update_stats_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not _affects_stats(update_fields):
+        return
+
+    buckets = {get_stats_bucket(instance.date, instance.walkType)}
+    buckets.add(getattr(instance, '_stats_bucket_before', None))
+
+    for bucket in buckets:
+        if bucket:
+            refresh_route_stats(*bucket)
+
+
+@receiver(post_save, sender=Route)
+def update_grid_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'points' not in update_fields):
+        return
+    index_route_track(instance)
+
+
+@receiver(post_delete, sender=Route)
+def update_stats_on_delete(sender, instance, **kwargs):
+    bucket = get_stats_bucket(instance.date, instance.walkType)
+    if bucket:
+        refresh_route_stats(*bucket)
@@ -0,0 +1,234 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Route
+from .serializers import RouteIndexSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.lock'
+HASH_LENGTH = 12
+# Имена файлов, которые пишет выгрузка; всё остальное в каталоге не трогаем
+SNAPSHOT_FILE_RE = re.compile(
+    rf'^(?:index|tracks|routes/\d+)\.[0-9a-f]{{{HASH_LENGTH}}}\.json(?:\.gz|\.br)?$'
+)
+
+# Максимальные уровни сжатия в разы медленнее, а файлы меньше лишь на ~1%
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _dump(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _write_file(path, content):
+    """Пишем через временный файл, чтобы nginx никогда не отдал недописанный JSON."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _write_with_variants(root, name, content):
+    """Пишет файл и его сжатые варианты (.gz, .br) для gzip_static/brotli_static."""
+    path = os.path.join(root, name)
+    _write_file(path, content)
+    _write_file(f"{path}.gz", gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0))
+    if brotli is not None:
+        _write_file(f"{path}.br", brotli.compress(content, quality=BROTLI_QUALITY))
+
+
+def _write_hashed(root, prefix, content, written):
+    """
+    Пишет файл с хешем содержимого в имени и возвращает его относительный путь.
+    Неизменившиеся файлы не перезаписываются.
+    """
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    name = f"{prefix}.{digest}.json"
+    if not os.path.exists(os.path.join(root, name)):
+        _write_with_variants(root, name, content)
+    written.add(name)
+    return name
+
+
+def _read_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), 'rb') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _snapshot_entries(root):
+    """Относительные пути файлов в корне снимка и в routes/."""
+    entries = []
+    for subdir in ('', 'routes'):
+        path = os.path.join(root, subdir)
+        if not os.path.isdir(path):
+            continue
+        for name in os.listdir(path):
+            entries.append(f"{subdir}/{name}" if subdir else name)
+    return entries
+
+
+def _is_service_file(name):
+    """Служебные файлы выгрузки: манифест, блокировка и недописанные временные файлы."""
+    return name.endswith('.tmp') or name in (LOCK_NAME, 'routes') or name.startswith(MANIFEST_NAME)
+
+
+def _check_root(root):
+    """
+    Не даём выгрузке работать в чужом каталоге: без manifest.json в нём
+    допускаются только файлы самого снимка (например, от прерванной первой выгрузки).
+    """
+    if not os.path.isdir(root) or os.path.exists(os.path.join(root, MANIFEST_NAME)):
+        return
+    foreign = [
+        name for name in _snapshot_entries(root)
+        if not (_is_service_file(name) or SNAPSHOT_FILE_RE.match(name))
+    ]
+    if foreign:
+        raise ValueError(
+            f"Каталог {root} не пуст и не содержит {MANIFEST_NAME} - выгрузка снимка отменена"
+        )
+
+
+def _cleanup(root, keep):
+    """
+    Удаляет файлы снимков, на которые не ссылается ни текущий, ни предыдущий манифест.
+    Трогаются только файлы с именами по схеме выгрузки.
+    """
+    for name in _snapshot_entries(root):
+        if not SNAPSHOT_FILE_RE.match(name):
+            continue
+        base = re.sub(r'\.(gz|br)$', '', name)
+        if base not in keep:
+            os.remove(os.path.join(root, name))
+
+
+def export_routes_snapshot(root=None):
+    """
+    Выгружает каталог маршрутов в статические файлы для nginx:
+    индекс без треков, файл с треком на каждый маршрут, общий файл
+    со всеми треками и manifest.json, указывающий на актуальные версии.
+    Одновременные выгрузки (несколько воркеров) выполняются по очереди.
+    """
+    root = root or settings.ROUTES_SNAPSHOT_ROOT
+    _check_root(root)
+    os.makedirs(root, exist_ok=True)
+
+    with open(os.path.join(root, LOCK_NAME), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _export(root)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _export(root):
+    previous = _read_manifest(root) or {}
+    written = set()
+
+    # Трек берётся из базы готовым JSON-текстом: без разбора и повторной сериализации.
+    # Неизменившиеся файлы по хешу не перезаписываются и не сжимаются заново
+    geometry = {}
+    tracks = []
+    routes = Route.objects.annotate(points_json=Cast('points', TextField())).values_list('id', 'points_json')
+    for route_id, points_json in routes.iterator(chunk_size=50):
+        points_json = (points_json or '').strip()
+        points_json = points_json.encode('utf-8') if points_json.startswith('[') else b'[]'
+        geometry[route_id] = _write_hashed(
+            root, f"routes/{route_id}", b'{"id":%d,"points":%s}' % (route_id, points_json), written
+        )
+        tracks.append(b'"%d":%s' % (route_id, points_json))
+
+    tracks_name = _write_hashed(root, 'tracks', b'{' + b','.join(tracks) + b'}', written)
+
+    index = []
+    for route in Route.objects.defer('points').iterator(chunk_size=50):
+        data = RouteIndexSerializer(route).data
+        data.pop('points', None)
+        data['geometry'] = geometry.get(route.id)
+        index.append(data)
+
+    index_name = _write_hashed(root, 'index', _dump(index), written)
+
+    manifest = {
+        'version': index_name.split('.')[1],
+        'generatedAt': timezone.now(),
+        'index': index_name,
+        'tracks': tracks_name,
+        'routeCount': len(index),
+        'files': sorted(written),
+    }
+    _write_with_variants(root, MANIFEST_NAME, _dump(manifest))
+
+    _cleanup(root, written | set(previous.get('files', [])))
+
+    return manifest
+
+
+def _export_safely():
+    try:
+        export_routes_snapshot()
+    except Exception:
+        logger.exception("Не удалось выгрузить статический снимок маршрутов")
+
+
+_state_lock = threading.Lock()
+_running = False
+_pending = False
+
+
+def _export_worker():
+    global _running, _pending
+    try:
+        while True:
+            _export_safely()
+            with _state_lock:
+                if not _pending:
+                    _running = False
+                    return
+                _pending = False
+    finally:
+        connections.close_all()
+
+
+def _start_export():
+    """
+    Запускает выгрузку в фоновом потоке. Если она уже идёт, после неё
+    будет выполнена ещё одна, так что частые правки склеиваются.
+    """
+    global _running, _pending
+    with _state_lock:
+        if _running:
+            _pending = True
+            return
+        _running = True
+    threading.Thread(target=_export_worker, name='routes-snapshot', daemon=True).start()
+
+
+def schedule_routes_snapshot():
+    """Перевыгружает снимок в фоне после фиксации текущей транзакции."""
+    transaction.on_commit(_start_export)
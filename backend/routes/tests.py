@@ -1,3 +1,352 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from .grid import cell_of, cell_range, track_cells
+from .models import Route, RouteStats, RouteCell
+from .services import rebuild_route_stats
+from . import snapshot
+
+
+class RouteBatchTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('admin'))
+        self.walk = Route.objects.create(name='walk', date='2024-05-15', distanceKm=10, walkType='walk')
+        self.bike = Route.objects.create(name='bike', date='2024-05-15', distanceKm=30, walkType='bike')
+
+    def batch(self, data):
+        return self.client.post('/api/routes/batch/', data, format='json')
+
+    def stats(self):
+        return {
+            (row.year, row.walkType): (row.routeCount, row.totalKm)
+            for row in RouteStats.objects.all()
+        }
+
+    def test_invalid_item_rolls_back_whole_batch(self):
+        response = self.batch({
+            'create': [{'name': 'new', 'date': '2024-05-15', 'distanceKm': 5}, {'date': 'not a date'}],
+            'update': [{'id': self.walk.id, 'name': 'renamed'}],
+            'delete': [self.bike.id],
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(1, response.data['errors']['create'])
+        self.assertEqual(Route.objects.count(), 2)
+        self.assertEqual(Route.objects.get(id=self.walk.id).name, 'walk')
+        self.assertTrue(Route.objects.filter(id=self.bike.id).exists())
+
+    def test_non_object_body_is_rejected(self):
+        response = self.batch([{'create': []}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_and_delete_of_same_route_is_rejected(self):
+        response = self.batch({'update': [{'id': self.walk.id, 'name': 'x'}], 'delete': [self.walk.id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Route.objects.filter(id=self.walk.id).exists())
+
+    def test_duplicate_delete_is_rejected(self):
+        response = self.batch({'delete': [self.walk.id, self.walk.id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Route.objects.filter(id=self.walk.id).exists())
+
+    def test_malformed_delete_id_is_rejected(self):
+        response = self.batch({'delete': [{'id': self.walk.id}, True]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['errors']['delete']), {0, 1})
+        self.assertEqual(Route.objects.count(), 2)
+
+    def test_malformed_update_id_is_rejected(self):
+        response = self.batch({'update': [{'id': [self.walk.id], 'name': 'x'}]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(0, response.data['errors']['update'])
+        self.assertEqual(Route.objects.get(id=self.walk.id).name, 'walk')
+
+    def test_update_moves_stats_between_buckets(self):
+        response = self.batch({'update': [{'id': self.walk.id, 'date': '2023-05-15', 'walkType': 'bike'}]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stats(), {
+            (2024, 'bike'): (1, 30.0),
+            (2023, 'bike'): (1, 10.0),
+        })
+
+    def test_delete_refreshes_stats(self):
+        response = self.batch({'delete': [self.bike.id], 'idsOnly': True})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted'], [self.bike.id])
+        self.assertEqual(self.stats(), {(2024, 'walk'): (1, 10.0)})
+
+    def test_create_returns_brief_results_and_updates_stats(self):
+        response = self.batch({
+            'create': [{'name': 'new', 'date': '2024-05-15', 'distanceKm': 5, 'points': [{'lat': 1, 'lng': 2}]}],
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('points', response.data['created'][0])
+        self.assertEqual(self.stats()[(2024, 'walk')], (2, 15.0))
+
+
+class RouteGridTests(APITestCase):
+    # Один длинный сегмент ~6 км без промежуточных точек
+    SPARSE_TRACK = [{'lat': 56.80, 'lng': 60.50}, {'lat': 56.80, 'lng': 60.60}]
+
+    def near(self, **params):
+        return self.client.get('/api/routes/near/', params)
+
+    def test_track_cells_cover_whole_sparse_segment(self):
+        cells = track_cells(self.SPARSE_TRACK)
+
+        self.assertIn(cell_of(56.80, 60.55), cells)
+        self.assertEqual({y for _, y in cells}, {cell_of(56.80, 60.50)[1]})
+
+    def test_cell_range_covers_radius(self):
+        (x0, x1), (y0, y1) = cell_range(56.80, 60.55, 1000)
+        x, y = cell_of(56.80, 60.55)
+
+        self.assertTrue(x0 < x < x1 and y0 < y < y1)
+        # Точка в 1 км к востоку (cos 56.8° ≈ 0.548) попадает в диапазон столбцов
+        east_x, _ = cell_of(56.80, 60.55 + 1000 / (111320 * 0.548))
+        self.assertTrue(x < east_x <= x1)
+
+    def test_route_is_indexed_on_save(self):
+        route = Route.objects.create(name='sparse', points=self.SPARSE_TRACK)
+
+        cells = set(RouteCell.objects.filter(route=route).values_list('cellX', 'cellY'))
+        self.assertEqual(cells, track_cells(self.SPARSE_TRACK))
+
+    def test_near_finds_sparse_segment_by_midpoint(self):
+        route = Route.objects.create(name='sparse', points=self.SPARSE_TRACK)
+
+        response = self.near(lat=56.801, lng=60.55, radius=200)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [route.id])
+        self.assertAlmostEqual(response.data[0]['distanceM'], 111, delta=2)
+
+    def test_near_skips_far_routes(self):
+        Route.objects.create(name='sparse', points=self.SPARSE_TRACK)
+        Route.objects.create(name='moscow', points=[{'lat': 55.75, 'lng': 37.60}, {'lat': 55.76, 'lng': 37.61}])
+
+        self.assertEqual(self.near(lat=56.81, lng=60.55, radius=500).data, [])
+        self.assertEqual([item['name'] for item in self.near(lat=56.81, lng=60.55, radius=1500).data], ['sparse'])
+
+    def test_glitch_point_is_indexed_as_gap(self):
+        track = [{'lat': 55.75, 'lng': 37.60}, {'lat': 0, 'lng': 0}, {'lat': 55.76, 'lng': 37.61}]
+
+        self.assertLessEqual(len(track_cells(track)), 4)
+
+        Route.objects.create(name='glitch', points=track)
+        self.assertEqual(self.near(lat=27.9, lng=18.8, radius=1000).data, [])
+
+    def test_invalid_points_are_ignored(self):
+        self.assertEqual(track_cells(5), set())
+        self.assertEqual(track_cells([
+            1, None, {'lat': 'x', 'lng': 1},
+            {'lat': float('nan'), 'lng': 1}, {'lat': 1e308, 'lng': 1}, {'lat': 56.8, 'lng': 200},
+        ]), set())
+
+    def test_non_list_points_are_accepted_by_api(self):
+        self.client.force_authenticate(User.objects.create_user('admin'))
+
+        response = self.client.post('/api/routes/', {'name': 'odd', 'date': '2024-05-15', 'points': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post('/api/routes/batch/', {'create': [{'name': 'odd', 'date': '2024-05-15', 'points': 5}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(RouteCell.objects.exists())
+
+    def test_near_validates_params(self):
+        for params in (
+            {'lat': 56.8, 'lng': 60.5, 'radius': 0},
+            {'lat': 56.8, 'lng': 60.5, 'radius': -10},
+            {'lat': 56.8, 'lng': 60.5, 'radius': 20000},
+            {'lat': 56.8, 'lng': 60.5, 'radius': 'far'},
+            {'lat': 100, 'lng': 60.5},
+            {'lng': 60.5},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.near(**params).status_code, 400)
+
+
+class RouteStatsTests(APITestCase):
+    def stats(self):
+        return {
+            (row.year, row.walkType): (row.routeCount, row.totalKm, row.longestRoute_id)
+            for row in RouteStats.objects.all()
+        }
+
+    def test_save_creates_and_updates_bucket(self):
+        short = Route.objects.create(name='short', date='2024-05-15', distanceKm=10)
+        long = Route.objects.create(name='long', date='2024-05-15', distanceKm=25)
+
+        self.assertEqual(self.stats(), {(2024, 'walk'): (2, 35.0, long.id)})
+
+        short.distanceKm = 40
+        short.save()
+        self.assertEqual(self.stats(), {(2024, 'walk'): (2, 65.0, short.id)})
+
+    def test_save_moves_route_between_buckets(self):
+        route = Route.objects.create(name='r', date='2024-05-15', distanceKm=10)
+
+        route.date = '2023-05-15'
+        route.walkType = 'bike'
+        route.save()
+
+        self.assertEqual(self.stats(), {(2023, 'bike'): (1, 10.0, route.id)})
+
+    def test_delete_refreshes_and_removes_bucket(self):
+        first = Route.objects.create(name='a', date='2024-05-15', distanceKm=10)
+        second = Route.objects.create(name='b', date='2024-05-15', distanceKm=20)
+
+        second.delete()
+        self.assertEqual(self.stats(), {(2024, 'walk'): (1, 10.0, first.id)})
+
+        first.delete()
+        self.assertEqual(self.stats(), {})
+
+    def test_save_with_unrelated_update_fields_skips_stats(self):
+        route = Route.objects.create(name='r', date='2024-05-15', distanceKm=10)
+        RouteStats.objects.update(routeCount=99)
+
+        route.name = 'renamed'
+        with self.assertNumQueries(1):
+            route.save(update_fields=['name'])
+
+        self.assertEqual(RouteStats.objects.get().routeCount, 99)
+
+    def test_rebuild_restores_stats(self):
+        route = Route.objects.create(name='r', date='2024-05-15', distanceKm=10)
+        RouteStats.objects.all().delete()
+        RouteStats.objects.create(year=2000, walkType='bike', routeCount=5)
+
+        self.assertEqual(rebuild_route_stats(), 1)
+        self.assertEqual(self.stats(), {(2024, 'walk'): (1, 10.0, route.id)})
+
+    def test_stats_endpoint(self):
+        route = Route.objects.create(name='r', date='2024-05-15', distanceKm=10.04, walkType='bike')
+
+        response = self.client.get('/api/routes/stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{
+            'year': 2024, 'walkType': 'bike', 'routeCount': 1,
+            'totalKm': 10.0, 'longestKm': 10.04, 'longestRoute': route.id,
+        }])
+
+
+class RouteSnapshotTests(APITestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.first = Route.objects.create(name='first', points=[{'lat': 56.8, 'lng': 60.5}])
+        self.second = Route.objects.create(name='second', points=[{'lat': 56.9, 'lng': 60.6}])
+
+    def read(self, name):
+        with open(os.path.join(self.root, name), encoding='utf-8') as f:
+            return json.load(f)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.root, name))
+
+    def test_export_writes_manifest_index_and_tracks(self):
+        manifest = snapshot.export_routes_snapshot(self.root)
+
+        self.assertEqual(self.read('manifest.json')['index'], manifest['index'])
+        self.assertRegex(manifest['index'], r'^index\.[0-9a-f]{12}\.json$')
+        self.assertEqual(manifest['routeCount'], 2)
+
+        index = self.read(manifest['index'])
+        self.assertEqual({route['name'] for route in index}, {'first', 'second'})
+        for route in index:
+            self.assertNotIn('points', route)
+            self.assertRegex(route['geometry'], rf"^routes/{route['id']}\.[0-9a-f]{{12}}\.json$")
+            self.assertEqual(self.read(route['geometry'])['id'], route['id'])
+
+        tracks = self.read(manifest['tracks'])
+        self.assertEqual(tracks[str(self.first.id)], [{'lat': 56.8, 'lng': 60.5}])
+        for name in manifest['files']:
+            self.assertTrue(self.exists(f"{name}.gz"))
+
+    def test_edit_keeps_previous_files_and_skips_unchanged(self):
+        first_manifest = snapshot.export_routes_snapshot(self.root)
+        first_index = {route['id']: route['geometry'] for route in self.read(first_manifest['index'])}
+        unchanged = os.path.join(self.root, first_index[self.second.id])
+        mtime = os.stat(unchanged).st_mtime_ns
+
+        self.first.points = [{'lat': 1, 'lng': 2}]
+        self.first.save()
+        second_manifest = snapshot.export_routes_snapshot(self.root)
+        second_index = {route['id']: route['geometry'] for route in self.read(second_manifest['index'])}
+
+        self.assertNotEqual(first_index[self.first.id], second_index[self.first.id])
+        self.assertEqual(first_index[self.second.id], second_index[self.second.id])
+        self.assertEqual(os.stat(unchanged).st_mtime_ns, mtime)
+        # Файлы предыдущего манифеста остаются для клиентов, которые его уже загрузили
+        self.assertTrue(self.exists(first_index[self.first.id]))
+        self.assertTrue(self.exists(first_manifest['index']))
+
+        snapshot.export_routes_snapshot(self.root)
+        self.assertFalse(self.exists(first_index[self.first.id]))
+        self.assertFalse(self.exists(f"{first_index[self.first.id]}.gz"))
+        self.assertFalse(self.exists(first_manifest['index']))
+        self.assertTrue(self.exists(second_index[self.first.id]))
+
+    def test_files_outside_naming_scheme_are_not_touched(self):
+        snapshot.export_routes_snapshot(self.root)
+        foreign = ['notes.txt', 'index.json', 'routes/readme.md', 'routes/1.json.tmp']
+        for name in foreign:
+            with open(os.path.join(self.root, name), 'w') as f:
+                f.write('keep')
+
+        self.first.delete()
+        snapshot.export_routes_snapshot(self.root)
+        snapshot.export_routes_snapshot(self.root)
+
+        for name in foreign:
+            self.assertTrue(self.exists(name), name)
+
+    def test_refuses_foreign_root_without_manifest(self):
+        with open(os.path.join(self.root, 'settings.py'), 'w') as f:
+            f.write('keep')
+
+        with self.assertRaises(ValueError):
+            snapshot.export_routes_snapshot(self.root)
+
+        self.assertEqual(os.listdir(self.root), ['settings.py'])
+
+    def test_background_export_coalesces_pending_runs(self):
+        started, release, done = threading.Event(), threading.Event(), threading.Event()
+        calls = []
+
+        def fake_export():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            if len(calls) == 2:
+                done.set()
+
+        with mock.patch.object(snapshot, '_export_safely', fake_export):
+            snapshot._start_export()
+            started.wait(5)
+            snapshot._start_export()
+            snapshot._start_export()
+            release.set()
+            done.wait(5)
+            for _ in range(50):
+                if not snapshot._running:
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(snapshot._running)
@@ -1,4 +1,5 @@
 import json
+from collections import Counter
 
 import gpxpy
 from django.http import HttpResponse
@@ -6,9 +7,19 @@ from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 import os
-from .models import Route
-from .serializers import RouteSerializer
-from .services import process_gpx_file
+from .models import Route, RouteStats
+from .serializers import RouteSerializer, RouteStatsSerializer, RouteBriefSerializer
+from .services import process_gpx_file, apply_route_batch, find_routes_near
+from .snapshot import schedule_routes_snapshot
+
+def _batch_id(value):
+    """id маршрута из пакетного запроса или None, если это не целое число."""
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+NEAR_DEFAULT_RADIUS = 500
+NEAR_MAX_RADIUS = 10000
+
 
 class RouteViewSet(viewsets.ModelViewSet):
     queryset = Route.objects.all()
@@ -16,6 +27,18 @@ class RouteViewSet(viewsets.ModelViewSet):
 
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        schedule_routes_snapshot()
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        schedule_routes_snapshot()
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        schedule_routes_snapshot()
+
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def parse_gpx(self, request):
         file = request.FILES.get('file')
@@ -98,6 +121,9 @@ class RouteViewSet(viewsets.ModelViewSet):
                     print(f"!!! Ошибка {filename}: {e}")
                     stats['errors'] += 1
 
+        if stats['created']:
+            schedule_routes_snapshot()
+
         return Response({
             'status': 'success',
             'message': 'Импорт завершен',
@@ -106,6 +132,120 @@ class RouteViewSet(viewsets.ModelViewSet):
             'errors': stats['errors']
         })
 
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def batch(self, request):
+        """
+        Пакетное создание, частичное обновление и удаление маршрутов.
+        Ожидает {"create": [...], "update": [{"id": ..., ...}], "delete": [id, ...], "idsOnly": bool}.
+        Если хотя бы один элемент не прошёл валидацию, ничего не применяется.
+        """
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Ожидается объект с полями create, update и delete'}, status=400)
+
+        create_items = request.data.get('create') or []
+        update_items = request.data.get('update') or []
+        delete_ids = request.data.get('delete') or []
+
+        if not all(isinstance(items, list) for items in (create_items, update_items, delete_ids)):
+            return Response({'error': 'create, update и delete должны быть списками'}, status=400)
+
+        errors = {'create': {}, 'update': {}, 'delete': {}}
+
+        to_create = []
+        for index, item in enumerate(create_items):
+            serializer = RouteSerializer(data=item)
+            if serializer.is_valid():
+                to_create.append(serializer.validated_data)
+            else:
+                errors['create'][index] = serializer.errors
+
+        update_ids = [_batch_id(item.get('id')) if isinstance(item, dict) else None for item in update_items]
+        delete_ids = [_batch_id(pk) for pk in delete_ids]
+        # Трек не нужен ни для валидации, ни для bulk_update, если его не меняют
+        existing = Route.objects.defer('points').in_bulk([pk for pk in update_ids if pk is not None])
+
+        update_counts = Counter(pk for pk in update_ids if pk is not None)
+        delete_counts = Counter(pk for pk in delete_ids if pk is not None)
+
+        to_update = []
+        for index, (pk, item) in enumerate(zip(update_ids, update_items)):
+            route = existing.get(pk)
+            if pk is None:
+                errors['update'][index] = {'id': ['Ожидается целочисленный id']}
+                continue
+            if route is None:
+                errors['update'][index] = {'id': ['Маршрут не найден']}
+                continue
+            if update_counts[pk] > 1:
+                errors['update'][index] = {'id': ['Маршрут указан несколько раз']}
+                continue
+            if delete_counts[pk]:
+                errors['update'][index] = {'id': ['Маршрут одновременно обновляется и удаляется']}
+                continue
+            serializer = RouteSerializer(route, data=item, partial=True)
+            if serializer.is_valid():
+                to_update.append((route, serializer.validated_data))
+            else:
+                errors['update'][index] = serializer.errors
+
+        found_ids = set(
+            Route.objects.filter(pk__in=[pk for pk in delete_ids if pk is not None]).values_list('id', flat=True)
+        )
+        for index, pk in enumerate(delete_ids):
+            if pk is None:
+                errors['delete'][index] = {'id': ['Ожидается целочисленный id']}
+            elif pk not in found_ids:
+                errors['delete'][index] = {'id': ['Маршрут не найден']}
+            elif delete_counts[pk] > 1:
+                errors['delete'][index] = {'id': ['Маршрут указан несколько раз']}
+            elif update_counts[pk]:
+                errors['delete'][index] = {'id': ['Маршрут одновременно обновляется и удаляется']}
+
+        if any(errors.values()):
+            return Response({'errors': {key: value for key, value in errors.items() if value}}, status=400)
+
+        created, updated, deleted = apply_route_batch(to_create, to_update, delete_ids)
+        schedule_routes_snapshot()
+
+        if request.data.get('idsOnly'):
+            return Response({
+                'created': [route.id for route in created],
+                'updated': [route.id for route in updated],
+                'deleted': deleted,
+            })
+
+        return Response({
+            'created': RouteBriefSerializer(created, many=True).data,
+            'updated': RouteBriefSerializer(updated, many=True).data,
+            'deleted': deleted,
+        })
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        serializer = RouteStatsSerializer(RouteStats.objects.all(), many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def near(self, request):
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            radius = float(request.query_params.get('radius', NEAR_DEFAULT_RADIUS))
+        except (KeyError, ValueError):
+            return Response({'error': 'Нужно указать числовые lat, lng и, при желании, radius'}, status=400)
+
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({'error': 'Координаты вне допустимого диапазона'}, status=400)
+        if not (0 < radius <= NEAR_MAX_RADIUS):
+            return Response({'error': f'radius должен быть от 0 до {NEAR_MAX_RADIUS} м'}, status=400)
+
+        result = []
+        for route, distance in find_routes_near(lat, lng, radius):
+            data = RouteBriefSerializer(route).data
+            data['distanceM'] = round(distance)
+            result.append(data)
+        return Response(result)
+
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
         route = self.get_object()
@@ -1,3 +1,4 @@
+import axios from "axios";
 import apiClient from "./client";
 import { createColorCycle } from "../utils";
 import type { RouteItem, Location } from "../data/mockRoutes";
@@ -32,6 +33,21 @@ export interface ParseGpxResponse {
   endLocation: Location;
 }
 
+// Статический снимок каталога, который раздает nginx
+const SNAPSHOT_BASE_URL = import.meta.env.VITE_SNAPSHOT_BASE_URL || "/snapshot";
+
+interface SnapshotManifest {
+  version: string;
+  index: string;
+  tracks: string;
+  routeCount: number;
+}
+
+type SnapshotRoute = ApiRoute & { geometry: string | null };
+
+// Все треки снимка одним файлом: id маршрута -> точки
+type SnapshotTracks = Record<string, Array<{ lat: number; lng: number }>>;
+
 export interface BulkImportResponse {
   created: number;
   skipped: number;
@@ -118,6 +134,28 @@ export const routesApi = {
     return response.data.map(mapApiRouteToRouteItem);
   },
 
+  // Получить все маршруты из статического снимка, при ошибке - через API
+  getAllFromSnapshot: async (): Promise<RouteItem[]> => {
+    try {
+      const { data: manifest } = await axios.get<SnapshotManifest>(
+        `${SNAPSHOT_BASE_URL}/manifest.json`
+      );
+      const [{ data: index }, { data: tracks }] = await Promise.all([
+        axios.get<SnapshotRoute[]>(`${SNAPSHOT_BASE_URL}/${manifest.index}`),
+        axios.get<SnapshotTracks>(`${SNAPSHOT_BASE_URL}/${manifest.tracks}`),
+      ]);
+      return index.map((route) =>
+        mapApiRouteToRouteItem({
+          ...route,
+          points: tracks[String(route.id)] || [],
+        })
+      );
+    } catch (error) {
+      console.warn("Route snapshot is unavailable, using API:", error);
+      return routesApi.getAll();
+    }
+  },
+
   // Получить маршрут по ID
   getById: async (id: number): Promise<RouteItem> => {
     const response = await apiClient.get<ApiRoute>(`/routes/${id}/`);
@@ -54,7 +54,7 @@ function MapPage() {
       try {
         setIsLoading(true);
         setError(null);
-        const data = await routesApi.getAll();
+        const data = await routesApi.getAllFromSnapshot();
         setRoutes(data);
       } catch (err) {
         setError(